@@ -0,0 +1,49 @@
+import os
+import sys
+import pytest
+from fastapi.testclient import TestClient
+
+# Use a shared in-memory SQLite database for the tests instead of the atm.db file.
+# This must be set before the app (and db.database) is imported.
+os.environ["DB_PATH"] = "file::memory:?cache=shared"
+
+# Ensure the directory above this Tests folder is on sys.path so we can import main.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app  # main.py is now importable from the project root
+from api.accounts import get_db
+from db import database
+
+
+# Create a test client for the FastAPI app, shared by all the tests.
+# Entering it runs the app lifespan (database setup) once for the whole session.
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+# Open one database connection for the whole session and keep it inside a transaction
+# that is never committed. The endpoints use it (as both reader and writer) through
+# an override of the get_db dependency.
+# The connection is driven on the client's event loop through its portal.
+@pytest.fixture(scope="session")
+def db_conn(client):
+    conn = client.portal.call(database.connect)
+    client.portal.call(conn.execute, "BEGIN")
+    pool = database.ConnectionPool(conn, [conn])
+    client.portal.call(pool.start_writer)
+    app.dependency_overrides[get_db] = lambda: pool
+    yield conn
+    del app.dependency_overrides[get_db]
+    client.portal.call(conn.execute, "ROLLBACK")
+    client.portal.call(pool.close)
+
+
+# Start and end every test with an empty balance cache, so no test sees balances
+# cached by another one (or rolled back since)
+@pytest.fixture(autouse=True)
+def clear_balance_cache():
+    database._BAL_CACHE.clear()
+    yield
+    database._BAL_CACHE.clear()
@@ -1,18 +1,18 @@
-import os
-import sys
-from fastapi.testclient import TestClient
+import pytest
 
-# Ensure the directory above this Tests folder is on sys.path so we can import main.py
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from main import app  # main.py is now importable from the project root
+# Run every test inside a savepoint that is rolled back afterwards, so tests never see
+# each other's accounts.
+@pytest.fixture(autouse=True)
+def db_transaction(client, db_conn):
+    client.portal.call(db_conn.execute, "SAVEPOINT test")
+    yield
+    client.portal.call(db_conn.execute, "ROLLBACK TO test")
+    client.portal.call(db_conn.execute, "RELEASE test")
 
-# Create a test client for the FastAPI app
-# This allows us to make requests to the API endpoints in our tests
-client = TestClient(app)
 
 # Test deosit and then balance retrieval
-def test_deposit_then_get_balance():
+def test_deposit_then_get_balance(client):
     account = "112"
     resp = client.post(f"/accounts/{account}/deposit", json={"amount": 50.0})
     assert resp.status_code == 200
@@ -23,7 +23,7 @@ def test_deposit_then_get_balance():
 
 
 #Test deposit, withdraw and then get balance
-def test_deposit_withdraw_then_balance():
+def test_deposit_withdraw_then_balance(client):
     account = "223"
     resp = client.post(f"/accounts/{account}/deposit", json={"amount": 50.0})
     assert resp.status_code == 200
@@ -35,16 +35,83 @@ def test_deposit_withdraw_then_balance():
 
 
 #Test withdraw with insufficient funds
-def test_overdraft_error():
+def test_overdraft_error(client):
     account = "334"
     resp = client.post(f"/accounts/{account}/withdraw", json={"amount": 1500.0})
     assert resp.status_code == 400
 
 
+#Test overdraft on an account with a known balance leaves the balance unchanged
+def test_overdraft_after_deposit_keeps_balance(client):
+    account = "556"
+    resp = client.post(f"/accounts/{account}/deposit", json={"amount": 100.0})
+    assert resp.status_code == 200
+    resp = client.post(f"/accounts/{account}/withdraw", json={"amount": 1200.0})
+    assert resp.status_code == 400
+    bal_resp = client.get(f"/accounts/{account}/balance")
+    assert bal_resp.status_code == 200
+    assert bal_resp.json()["balance"] == 100.0
+
+
+#Test balances add up exactly to the cent
+def test_deposits_add_up_exactly(client):
+    account = "668"
+    for _ in range(3):
+        resp = client.post(f"/accounts/{account}/deposit", json={"amount": 0.1})
+        assert resp.status_code == 200
+    assert resp.json()["balance"] == 0.3
+    bal_resp = client.get(f"/accounts/{account}/balance")
+    assert bal_resp.json()["balance"] == 0.3
+
+
+#Test invalid deposit bodies are rejected
+def test_deposit_invalid_body(client):
+    account = "667"
+    resp = client.post(f"/accounts/{account}/deposit", json={"amount": 0})
+    assert resp.status_code == 422
+    resp = client.post(f"/accounts/{account}/deposit", json={"amount": 10.0, "currency": "USD"})
+    assert resp.status_code == 422
+    for amount in [0.004, 10.005, 1e17]:
+        resp = client.post(f"/accounts/{account}/deposit", json={"amount": amount})
+        assert resp.status_code == 422
+    resp = client.post(
+        f"/accounts/{account}/deposit",
+        content='{"amount": Infinity}',
+        headers={"Content-Type": "application/json"},
+    )
+    assert resp.status_code == 422
+    bal_resp = client.get(f"/accounts/{account}/balance")
+    assert bal_resp.json()["balance"] == 0.0
+
+
 #Test balance for account that does not exist in db
-def test_new_account_get_balance():
+def test_new_account_get_balance(client):
     account = "445"
     resp = client.get(f"/accounts/{account}/balance")
     assert resp.status_code == 200
     assert resp.json()["balance"] == 0.0
 
+
+#Test a missing account's balance is updated by its first deposit
+def test_new_account_balance_then_deposit(client):
+    account = "990"
+    resp = client.get(f"/accounts/{account}/balance")
+    assert resp.json()["balance"] == 0.0
+    resp = client.post(f"/accounts/{account}/deposit", json={"amount": 25.0})
+    assert resp.status_code == 200
+    resp = client.get(f"/accounts/{account}/balance")
+    assert resp.json()["balance"] == 25.0
+
+
+#Test every endpoint is registered exactly once
+def test_routes_registered_once(client):
+    routes = [(route.path, method) for route in client.app.routes for method in route.methods]
+    assert len(routes) == len(set(routes))
+
+
+#Test health check endpoint
+def test_is_alive(client):
+    for _ in range(2):
+        resp = client.get("/is_alive")
+        assert resp.status_code == 200
+        assert resp.json() == {"active": "true"}
@@ -0,0 +1,143 @@
+import asyncio
+
+import aiosqlite
+import pytest
+
+from db import database
+
+
+# Open a connection pool on a temporary database file
+async def open_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "atm.db"))
+    pool = await database.initialize_database()
+    pool.start_writer()
+    return pool
+
+
+#Test pool connections use WAL journaling in autocommit mode
+def test_connections_use_wal(tmp_path, monkeypatch):
+    async def run():
+        pool = await open_pool(tmp_path, monkeypatch)
+        async with pool.acquire_writer() as conn:
+            async with conn.execute("PRAGMA journal_mode") as cursor:
+                journal_mode = (await cursor.fetchone())[0]
+            in_transaction = conn.in_transaction
+        await pool.close()
+        return journal_mode, in_transaction
+
+    assert asyncio.run(run()) == ("wal", False)
+
+
+#Test concurrent updates are all applied and each one gets its own result
+def test_concurrent_updates(tmp_path, monkeypatch):
+    async def run():
+        pool = await open_pool(tmp_path, monkeypatch)
+        results = await asyncio.gather(
+            *[database.deposit(pool, "778", 1.0) for _ in range(100)],
+            *[database.withdraw(pool, "889", 600.0) for _ in range(2)],
+            return_exceptions=True,
+        )
+        database._BAL_CACHE.clear()
+        balances = (await database.get_balance(pool, "778"), await database.get_balance(pool, "889"))
+        await pool.close()
+        return results, balances
+
+    results, balances = asyncio.run(run())
+    assert sorted(results[:100]) == list(range(1, 101))
+    assert results[100] == -600.0
+    assert isinstance(results[101], database.InsufficientFundsError)
+    assert balances == (100.0, -600.0)
+
+
+#Test a database with REAL balances is converted to integer cents
+def test_migrate_real_balances(tmp_path, monkeypatch):
+    async def run():
+        old = await aiosqlite.connect(tmp_path / "atm.db")
+        await old.execute(
+            "CREATE TABLE accounts (account_number TEXT PRIMARY KEY, "
+            "balance REAL NOT NULL DEFAULT 0.0 CHECK (balance >= -1000))"
+        )
+        await old.execute("INSERT INTO accounts VALUES ('991', 12.34)")
+        await old.commit()
+        await old.close()
+
+        pool = await open_pool(tmp_path, monkeypatch)
+        async with pool.acquire_reader() as conn:
+            async with conn.execute("SELECT balance, typeof(balance) FROM accounts") as cursor:
+                row = await cursor.fetchone()
+        balance = await database.get_balance(pool, "991")
+        await pool.close()
+        return tuple(row), balance
+
+    assert asyncio.run(run()) == ((1234, "integer"), 12.34)
+
+
+#Test the conversion to cents fails cleanly when a balance is below a lowered debt limit
+def test_migrate_real_balances_over_limit(tmp_path, monkeypatch):
+    async def run():
+        path = tmp_path / "atm.db"
+        old = await aiosqlite.connect(path)
+        await old.execute(
+            "CREATE TABLE accounts (account_number TEXT PRIMARY KEY, "
+            "balance REAL NOT NULL DEFAULT 0.0 CHECK (balance >= -1000))"
+        )
+        await old.execute("INSERT INTO accounts VALUES ('992', -800.0), ('993', 10.0)")
+        await old.commit()
+        await old.close()
+
+        monkeypatch.setattr(database, "MAX_DEBT", 500.0)
+        monkeypatch.setattr(database, "MAX_DEBT_CENTS", 50000)
+        with pytest.raises(ValueError, match="992"):
+            await open_pool(tmp_path, monkeypatch)
+
+        # The old table is left untouched
+        conn = await aiosqlite.connect(path)
+        async with conn.execute("SELECT account_number, balance FROM accounts ORDER BY 1") as cursor:
+            rows = await cursor.fetchall()
+        await conn.close()
+        return rows
+
+    assert asyncio.run(run()) == [("992", -800.0), ("993", 10.0)]
+
+
+#Test a failing update does not stop the writer from applying the next ones
+def test_update_after_failed_update(tmp_path, monkeypatch):
+    async def run():
+        pool = await open_pool(tmp_path, monkeypatch)
+        try:
+            # 1e17 is more cents than an SQLite INTEGER can hold
+            failed = await asyncio.gather(database.deposit(pool, "1", 1e17), return_exceptions=True)
+            balance = await asyncio.wait_for(database.deposit(pool, "2", 5.0), timeout=5)
+        finally:
+            await pool.close()
+        return failed[0], balance
+
+    failed, balance = asyncio.run(run())
+    assert isinstance(failed, OverflowError)
+    assert balance == 5.0
+
+
+#Test a failed startup closes the connections it already opened
+def test_initialize_failure_closes_connections(tmp_path, monkeypatch):
+    opened = []
+    connect = database.connect
+
+    async def failing_connect(query_only=False):
+        if query_only and len(opened) == 2:
+            raise aiosqlite.OperationalError("reader failed")
+        conn = await connect(query_only)
+        opened.append(conn)
+        return conn
+
+    async def run():
+        monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "atm.db"))
+        monkeypatch.setattr(database, "connect", failing_connect)
+        with pytest.raises(aiosqlite.OperationalError):
+            await database.initialize_database()
+        for conn in opened:
+            # Using a closed connection raises ValueError("Connection closed")
+            with pytest.raises(ValueError):
+                await conn.execute("SELECT 1")
+
+    asyncio.run(run())
+    assert len(opened) == 2
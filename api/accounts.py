@@ -1,14 +1,39 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field, PositiveFloat
+from typing import Annotated
 
-from db.database import InsufficientFundsError
-from logic import operations
+import aiosqlite
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field
+
+from db import database
+from db.database import ConnectionPool, InsufficientFundsError
 
 router = APIRouter()
 
+# Largest amount accepted in a single deposit or withdraw request
+MAX_AMOUNT = 1_000_000_000
+
+
+# Balances are stored in whole cents, so reject amounts that would be rounded
+def _check_whole_cents(amount: float) -> float:
+    if round(amount * 100) / 100 != amount:
+        raise ValueError("amount must be a whole number of cents")
+    return amount
+
+
+# Amount of money in a deposit or withdraw request: greater than zero, at most MAX_AMOUNT
+# and in whole cents, so the amount applied to the balance is exactly the one requested
+Amount = Annotated[float, Field(gt=0, le=MAX_AMOUNT, allow_inf_nan=False), AfterValidator(_check_whole_cents)]
+
+
+# Dependency returning the database connection pool opened in the app lifespan
+def get_db(request: Request) -> ConnectionPool:
+    return request.app.state.db_pool
+
+
 #GET balance endpoint 
-@router.get("/{account_number}/balance")
-async def get_balance_api(account_number: str):
+@router.get("/{account_number}/balance", response_model=None, response_class=ORJSONResponse)
+async def get_balance_api(account_number: str, pool: ConnectionPool = Depends(get_db)):
     """
     Retrieve the balance of a specific account.
 
@@ -18,21 +43,27 @@ async def get_balance_api(account_number: str):
     Returns:
         object: A object containing the account number and its current balance.
         if the account does not exists, we retun 0 as the balance.
-        If an unexpected error occurs, a 500 HTTPException is raised.
+        If a database error occurs, a 500 HTTPException is raised.
     """
     try:
-        current_balance = await operations.get_balance(account_number)
-        return {"account_number": account_number, "balance": current_balance}
-    except Exception:
-        # Unexpected error occurred while retrieving the balance
+        try:
+            current_balance = await database.get_balance(pool, account_number)
+        except database.AccountNotFoundError:
+            # Account not found, return 0 balance
+            current_balance = 0.0
+        return ORJSONResponse({"account_number": account_number, "balance": current_balance})
+    except aiosqlite.Error:
+        # Database error occurred while retrieving the balance
         raise HTTPException(status_code=500, detail="Unable to retrieve balance")
 
 
 class WithdrawBody(BaseModel):
-    amount: PositiveFloat = Field(..., description="> 0")
+    model_config = ConfigDict(extra="forbid")
 
-@router.post("/{account_number}/withdraw")
-async def withdraw_money_api(account_number: str, data: WithdrawBody):
+    amount: Amount
+
+@router.post("/{account_number}/withdraw", response_model=None, response_class=ORJSONResponse)
+async def withdraw_money_api(account_number: str, data: WithdrawBody, pool: ConnectionPool = Depends(get_db)):
     '''
     this api is used to withdraw money from an account.
     args:
@@ -42,30 +73,32 @@ async def withdraw_money_api(account_number: str, data: WithdrawBody):
     Returns:
         object: A object containing the account number, withdrawn amount, and remaining balance.
         If the withdrawal fails due to insufficient funds, a 400 HTTPException is raised.
-        If an unexpected error occurs, a 500 HTTPException is raised.
-    limits: maximum debt is MAX_DEBT, which is defined in the logic/operations.py file. 
+        If a database error occurs, a 500 HTTPException is raised.
+    limits: maximum debt is MAX_DEBT, which is defined in the db/database.py file.
 
     '''
     try:
-        balance = await  operations.withdraw(account_number, data.amount)
-        return {
+        balance = await database.withdraw(pool, account_number, data.amount)
+        return ORJSONResponse({
             "account_number": account_number,
             "withdrawn_amount": data.amount,
             "balance": balance,
             "status": "success"
-        }
+        })
     except InsufficientFundsError:
         raise HTTPException(status_code=400, detail="Insufficient funds for withdrawal")
-    except Exception:
+    except aiosqlite.Error:
         raise HTTPException(status_code=500, detail="Unable to process withdrawal")
 
 
 class DepositBody(BaseModel):
-    amount: float = Field(..., gt=0, description="Amount to deposit must be greater than zero.")
+    model_config = ConfigDict(extra="forbid")
+
+    amount: Amount
 
 
-@router.post("/{account_number}/deposit")
-async def deposit_money_api(account_number: str, data: DepositBody):
+@router.post("/{account_number}/deposit", response_model=None, response_class=ORJSONResponse)
+async def deposit_money_api(account_number: str, data: DepositBody, pool: ConnectionPool = Depends(get_db)):
     """
     Deposit money into a specific account.
     
@@ -75,18 +108,18 @@ async def deposit_money_api(account_number: str, data: DepositBody):
         
     Returns:
         object: A object containing the account number, deposited amount, and updated balance.
-        If the deposit fails due to an unexpected error, a 500 HTTPException is raised.
+        If the deposit fails due to a database error, a 500 HTTPException is raised.
         
         """
     
     try:
-        balance = await operations.deposit(account_number, data.amount)
+        balance = await database.deposit(pool, account_number, data.amount)
 
-        return {
+        return ORJSONResponse({
             "account_number": account_number,
             "deposited_amount": data.amount,
             "balance": balance,
             "status": "success"
-        }
-    except Exception:
+        })
+    except aiosqlite.Error:
         raise HTTPException(status_code=500, detail="Unable to process deposit")
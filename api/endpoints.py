@@ -1,11 +1,16 @@
 from api.accounts import router as accounts_router
 from fastapi import  APIRouter
+from fastapi.responses import Response
 
 router = APIRouter()
+
+# The health check body never changes, so the response is serialized once and reused
+_ALIVE = Response(content=b'{"active":"true"}', media_type="application/json")
+
 # Health check endpoint to verify if the API is running
-@router.get("/is_alive")
-def is_alive():
-    return {"active": "true"}
+@router.get("/is_alive", response_model=None, response_class=Response)
+async def is_alive():
+    return _ALIVE
 
 # Include the accounts router
 router.include_router(accounts_router, prefix="/accounts", tags=["accounts"])
@@ -1,11 +1,62 @@
+import asyncio
 import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
 import aiosqlite
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DB_PATH = os.getenv("DB_PATH", "atm.db")
-MAX_DEBT = os.getenv("MAX_DEBT", 1000)
+# Parsed once at import: the value is injected into the CHECK constraint of the schema
+MAX_DEBT = float(os.getenv("MAX_DEBT", "1000"))
+# Balances are stored as whole cents, so the debt limit is too
+MAX_DEBT_CENTS = round(MAX_DEBT * 100)
+READER_CONNECTIONS = 4
+# Size of sqlite3's per-connection prepared statement cache
+CACHED_STATEMENTS = 256
+# Maximum number of account balances kept in memory
+BALANCE_CACHE_SIZE = 100_000
+# Maximum number of pending balance updates written in one transaction
+MAX_BATCH_SIZE = 64
+
+# The queries run on every request are kept as module constants so each call passes
+# the exact same SQL text, letting the statement cache of the long-lived connections
+# reuse the prepared statement instead of parsing it again.
+_SELECT_BALANCE_SQL = "SELECT balance FROM accounts WHERE account_number = ?"
+_UPSERT_SQL = """
+    INSERT INTO accounts(account_number, balance)
+    VALUES (?, ?)
+    ON CONFLICT(account_number)
+    DO UPDATE SET balance = accounts.balance + excluded.balance
+    RETURNING balance
+"""
+
+# Write-through cache of account balances in cents, in least recently used order.
+# Every successful update stores the balance returned by the UPSERT, and a lookup that
+# misses the cache fills it from the database, so repeated balance requests are served
+# from memory. Accounts that do not exist are cached too, with None as their balance,
+# until their first update. All writes go through this process, which keeps the cache
+# in sync with the database; it must not be used when several processes write to the same file.
+_BAL_CACHE: OrderedDict[str, int | None] = OrderedDict()
+# Returned by _cache_get when the account is not in the cache at all
+_NOT_CACHED = object()
+
+
+def _cache_get(account_number: str):
+    balance = _BAL_CACHE.get(account_number, _NOT_CACHED)
+    if balance is not _NOT_CACHED:
+        _BAL_CACHE.move_to_end(account_number)
+    return balance
+
+
+def _cache_put(account_number: str, balance: int | None):
+    _BAL_CACHE[account_number] = balance
+    _BAL_CACHE.move_to_end(account_number)
+    if len(_BAL_CACHE) > BALANCE_CACHE_SIZE:
+        _BAL_CACHE.popitem(last=False)
+
 
 # Database exceptions when account not found for get balance 
 class AccountNotFoundError(Exception):
@@ -18,75 +69,280 @@ class InsufficientFundsError(Exception):
     pass
 
 
+# Open one of the long-lived connections used by the connection pool.
+# isolation_level=None puts the connection in autocommit mode and WAL lets
+# readers keep going while a write is in progress.
+# Reader connections are opened with query_only so they can never modify the database.
+# DB_PATH may also be an SQLite URI such as "file::memory:?cache=shared" (used by the tests).
+async def connect(query_only: bool = False) -> aiosqlite.Connection:
+    conn = await aiosqlite.connect(
+        DB_PATH, timeout=5, isolation_level=None, cached_statements=CACHED_STATEMENTS, uri=True
+    )
+    try:
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute("PRAGMA temp_store=MEMORY")
+        if query_only:
+            await conn.execute("PRAGMA query_only=1")
+    except BaseException:
+        await conn.close()
+        raise
+    return conn
+
+
+# A small pool of long-lived connections: one writer and several read-only readers.
+# Every aiosqlite connection runs its queries on its own background thread, so with
+# separate readers a balance lookup does not have to wait behind a write in progress.
+# SQLite allows only one writer at a time anyway, so there is a single writer connection.
+# Balance updates are not written by the requests themselves: they are queued and a
+# single writer task commits everything that queued up in one transaction.
+class ConnectionPool:
+    def __init__(self, writer: aiosqlite.Connection, readers: list[aiosqlite.Connection]):
+        self._connections = [writer, *readers]
+        self._writer = asyncio.Queue()
+        self._writer.put_nowait(writer)
+        self._readers = asyncio.Queue()
+        for reader in readers:
+            self._readers.put_nowait(reader)
+        self._updates = asyncio.Queue()
+        self._writer_task = None
+
+    # Borrow a read-only connection, waiting for one to be free
+    @asynccontextmanager
+    async def acquire_reader(self):
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    # Borrow the writer connection, waiting until no other write is using it
+    @asynccontextmanager
+    async def acquire_writer(self):
+        conn = await self._writer.get()
+        try:
+            yield conn
+        finally:
+            self._writer.put_nowait(conn)
+
+    # Start the task that writes the queued balance updates; called from the app lifespan
+    def start_writer(self):
+        self._writer_task = asyncio.create_task(self._write_batches())
+
+    # Queue a balance update and return a future resolved with the new balance in cents,
+    # or with InsufficientFundsError if the update would exceed the debt limit.
+    def enqueue_update(self, account_number: str, delta: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._updates.put_nowait((account_number, delta, future))
+        return future
+
+    # Take every update that is already waiting (up to MAX_BATCH_SIZE) and write them together.
+    # Updates that arrive while a batch is being committed form the next batch, so batches grow
+    # with the load while a lone update is written immediately.
+    # A batch that fails fails the updates in it, but the task keeps writing the next batches.
+    # A None item, queued by close(), stops the task once the updates before it are written.
+    async def _write_batches(self):
+        while True:
+            item = await self._updates.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) == MAX_BATCH_SIZE or self._updates.empty():
+                    break
+                item = self._updates.get_nowait()
+            if batch:
+                try:
+                    async with self.acquire_writer() as conn:
+                        await _write_batch(conn, batch)
+                except Exception as exc:
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(exc)
+            if item is None:
+                return
+
+    async def close(self):
+        try:
+            if self._writer_task is not None:
+                self._updates.put_nowait(None)
+                await self._writer_task
+        finally:
+            for conn in self._connections:
+                await conn.close()
+
+
 # Initialize the database and create the accounts table if it doesn't exist.
-# This function is called when the application starts.
-# It uses an async context manager to handle the database connection.
-# define the datatbase schema: primary key is account_number, balance is a real number with a default of 0.0.
+# This function is called when the application starts and returns the connection pool
+# used by all requests; the pool is closed when the application shuts down.
+# define the datatbase schema: primary key is account_number, balance is an integer number
+# of cents with a default of 0, so the arithmetic on balances is exact.
 # It also checks that the balance does not go below -MAX_DEBT.
-async def initialize_database():
-    async with aiosqlite.connect(DB_PATH) as conn:
-        await conn.execute(f'''
+# If any step fails, the connections opened so far are closed: aiosqlite runs each one on a
+# non-daemon thread, and a connection left open would keep the process from exiting.
+async def initialize_database() -> ConnectionPool:
+    writer = await connect()
+    readers = []
+    try:
+        await _migrate_real_balances(writer)
+        await writer.execute(f'''
             CREATE TABLE IF NOT EXISTS accounts (
                 account_number TEXT PRIMARY KEY,
-                balance REAL NOT NULL DEFAULT 0.0 CHECK (balance >= -{MAX_DEBT})
+                balance INTEGER NOT NULL DEFAULT 0 CHECK (balance >= -{MAX_DEBT_CENTS})
             )
         ''')
-        await conn.commit()
+        for _ in range(READER_CONNECTIONS):
+            readers.append(await connect(query_only=True))
+    except BaseException:
+        for conn in [writer, *readers]:
+            await conn.close()
+        raise
+    return ConnectionPool(writer, readers)
+
+
+# Databases created before balances were stored in cents have a REAL balance column.
+# Rebuild such a table with the INTEGER cents schema, converting the existing balances.
+async def _migrate_real_balances(conn: aiosqlite.Connection):
+    async with conn.execute("PRAGMA table_info(accounts)") as cursor:
+        columns = {row[1]: row[2] for row in await cursor.fetchall()}
+    if columns.get("balance", "").upper() != "REAL":
+        return
 
+    # Balances already below the current debt limit (MAX_DEBT lowered since they were written)
+    # would fail the CHECK constraint of the new table
+    async with conn.execute(
+        "SELECT account_number FROM accounts WHERE CAST(ROUND(balance * 100) AS INTEGER) < ?",
+        (-MAX_DEBT_CENTS,),
+    ) as cursor:
+        over_limit = [row[0] for row in await cursor.fetchall()]
+    if over_limit:
+        raise ValueError(
+            f"Cannot convert balances to cents: accounts {', '.join(over_limit)} "
+            f"are below the debt limit of -{MAX_DEBT}"
+        )
+
+    await conn.execute("BEGIN")
+    try:
+        await conn.execute("ALTER TABLE accounts RENAME TO accounts_real")
+        await conn.execute(f'''
+            CREATE TABLE accounts (
+                account_number TEXT PRIMARY KEY,
+                balance INTEGER NOT NULL DEFAULT 0 CHECK (balance >= -{MAX_DEBT_CENTS})
+            )
+        ''')
+        await conn.execute(
+            "INSERT INTO accounts(account_number, balance) "
+            "SELECT account_number, CAST(ROUND(balance * 100) AS INTEGER) FROM accounts_real"
+        )
+        await conn.execute("DROP TABLE accounts_real")
+        await conn.execute("COMMIT")
+    except BaseException:
+        await conn.execute("ROLLBACK")
+        raise
 
-# Get the balance of an account from the database.
+
+# Get the balance of an account, from the cache when possible, otherwise from the database.
 # If the account does not exist, it raises an AccountNotFoundError.
-# This function is used in the logic layer to retrieve the balance of an account.
-async def get_balance(account_number: str) -> float:
-    async with aiosqlite.connect(DB_PATH) as conn:
-        async with conn.execute(
-            "SELECT balance FROM accounts WHERE account_number = ?",
-            (account_number,)
-        ) as cursor:
-            row = await cursor.fetchone()
+# This function is used by the balance endpoint, which returns 0 for a missing account.
+async def get_balance(pool: ConnectionPool, account_number: str) -> float:
+    balance = _cache_get(account_number)
+    if balance is _NOT_CACHED:
+        async with pool.acquire_reader() as conn:
+            async with conn.execute(_SELECT_BALANCE_SQL, (account_number,)) as cursor:
+                row = await cursor.fetchone()
+        balance = row[0] if row is not None else None
+
+        # An update that finished while we were reading already stored a newer balance,
+        # so only fill the cache if the account is still missing from it.
+        if account_number not in _BAL_CACHE:
+            _cache_put(account_number, balance)
+
+    if balance is None:
+        raise AccountNotFoundError()
+
+    return balance / 100
 
-        if row is None:
-            raise AccountNotFoundError()
 
-        return row[0]
+# Write a batch of queued balance updates in a single transaction.
+# Each update still runs its own UPSERT, in queue order, so every request gets the balance
+# right after its own operation and a withdrawal that would break the CHECK constraint only
+# fails by itself; the batch saves the transaction overhead, not the statements.
+# A savepoint is used instead of BEGIN so the batch also works inside an outer transaction.
+# A single update needs no explicit transaction: in autocommit mode the UPSERT commits by
+# itself, which saves the round trips to the connection thread for SAVEPOINT and RELEASE.
+async def _write_batch(conn: aiosqlite.Connection, batch: list):
+    results = []
+    in_savepoint = len(batch) > 1
+    try:
+        if in_savepoint:
+            await conn.execute("SAVEPOINT batch")
+        for account_number, delta, future in batch:
+            if future.done():
+                # The request was cancelled while waiting, nobody will read the result
+                results.append(None)
+                continue
+            try:
+                async with conn.execute(_UPSERT_SQL, (account_number, delta)) as cursor:
+                    row = await cursor.fetchone()
+                results.append(row[0])
+            except aiosqlite.IntegrityError:
+                results.append(InsufficientFundsError())
+        if in_savepoint:
+            await conn.execute("RELEASE batch")
+    except Exception:
+        # Undo the updates of the batch; the writer task fails their futures
+        if in_savepoint and conn.in_transaction:
+            await conn.execute("ROLLBACK TO batch")
+            await conn.execute("RELEASE batch")
+        raise
 
+    for (account_number, _, future), result in zip(batch, results):
+        if result is None:
+            continue
+        if isinstance(result, InsufficientFundsError):
+            # The failed UPSERT left the balance unchanged, so the cached entry stays valid.
+            # Dropping it would let a slow cache-miss read fill in an older balance.
+            if not future.done():
+                future.set_exception(result)
+        else:
+            _cache_put(account_number, result)
+            if not future.done():
+                future.set_result(result)
 
-# Update the balance of an account by adding or subtracting a delta value.
-# This function uses an UPSERT operation to either insert a new account or update the existing balance.
+
+# Update the balance of an account by adding or subtracting a delta value in cents.
+# The update is queued for the pool's writer task, which uses an UPSERT operation to either
+# insert a new account or update the existing balance.
 # It raises InsufficientFundsError if the resulting balance would be less than -MAX_DEBT.
-# Returns the new balance after the operation.
-async def _update_balance(account_number: str, delta: float) -> float:
+# Returns the new balance in cents after the operation.
+async def _update_balance(pool: ConnectionPool, account_number: str, delta: int) -> int:
     """
-    Deposit or withdraw money (delta can be positive or negative).
-    Uses UPSERT with CHECK constraint to prevent balance < -1000.
-    Returns the new balance.
+    Deposit or withdraw money (delta in cents, can be positive or negative).
+    Uses UPSERT with CHECK constraint to prevent balance < -MAX_DEBT.
+    Returns the new balance in cents.
     """
-    async with aiosqlite.connect(DB_PATH, timeout=5) as conn:
-        try:
-            async with conn.execute(
-                """
-                INSERT INTO accounts(account_number, balance)
-                VALUES (?, ?)
-                ON CONFLICT(account_number)
-                DO UPDATE SET balance = accounts.balance + excluded.balance
-                RETURNING balance
-                """,
-                (account_number, delta),
-            ) as cursor:
-                row = await cursor.fetchone()
-                await conn.commit()
-                return row[0] if row else None
-        except aiosqlite.IntegrityError:
-            raise InsufficientFundsError()
+    return await pool.enqueue_update(account_number, delta)
+
+# Convert an amount of money to whole cents
+def _to_cents(amount: float) -> int:
+    return round(amount * 100)
 
 # Deposit money into an account
-async def deposit(account_number: str, amount: float) -> float:
+async def deposit(pool: ConnectionPool, account_number: str, amount: float) -> float:
     if amount <= 0:
         raise ValueError("Deposit amount must be positive")
-    return await _update_balance(account_number, amount)
+    return await _update_balance(pool, account_number, _to_cents(amount)) / 100
 
 # Withdraw money from an account
-async def withdraw(account_number: str, amount: float) -> float:
+# When the balance is cached, a withdrawal that would go below -MAX_DEBT is rejected
+# without a round trip to the database.
+async def withdraw(pool: ConnectionPool, account_number: str, amount: float) -> float:
     if amount <= 0:
         raise ValueError("Withdraw amount must be positive")
-    return await _update_balance(account_number, -amount)
+    cents = _to_cents(amount)
+    cached = _BAL_CACHE.get(account_number, _NOT_CACHED)
+    if cached is None:
+        # The account does not exist yet, so its balance is 0
+        cached = 0
+    if cached is not _NOT_CACHED and cached - cents < -MAX_DEBT_CENTS:
+        raise InsufficientFundsError()
+    return await _update_balance(pool, account_number, -cents) / 100
@@ -1,16 +1,46 @@
+import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
 from api.endpoints import router as api_router
 from db import database
 
-#this function initializes the database connection when the application starts
+#this function opens the database connection pool and starts its writer task when the application starts
+#and closes it when the application shuts down
 @asynccontextmanager
-async def lifespan(_app: FastAPI):
-    await database.initialize_database()
+async def lifespan(app: FastAPI):
+    app.state.db_pool = await database.initialize_database()
+    app.state.db_pool.start_writer()
     yield
+    await app.state.db_pool.close()
+
+# orjson serializes the JSON responses much faster than the standard json module
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
-app = FastAPI(lifespan=lifespan)
+# Validation errors echo the invalid input, which may be a float such as Infinity that the
+# default JSON encoder refuses; orjson writes non-finite floats as null instead.
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(_request: Request, exc: RequestValidationError):
+    return ORJSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
 
 # Include the API router
 app.include_router(api_router, prefix="")
 
+
+# Run with uvloop and httptools, the fastest event loop and HTTP parser uvicorn supports.
+# Every worker process runs the lifespan and opens its own connection pool.
+# The balance cache is kept per process and is only correct while one process writes
+# to the database, so a single worker is the default; WEB_CONCURRENCY sets the number of workers.
+if __name__ == "__main__":
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("UVICORN_PORT", 8000)),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", 1)),
+    )